@@ -1,18 +1,32 @@
+from __future__ import annotations
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkinter import PhotoImage
-import pyautogui
-import cv2
-import numpy as np
+import importlib
 import threading
+import queue
 import time
+import sys
+import ctypes
+import ctypes.util
+import io
+import shutil
+import subprocess
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Tuple, Callable
+from typing import Optional, Tuple, Callable, List, Dict, TYPE_CHECKING
 from dataclasses import dataclass
 from enum import Enum
 import logging
 from contextlib import contextmanager
+from functools import lru_cache
+
+# cv2, numpy and pyautogui are imported where they are used so the window
+# appears without paying their import cost up front
+if TYPE_CHECKING:
+    import numpy as np
 
 
 # Configure logging
@@ -22,6 +36,188 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Maximum number of captured frames waiting for the encoder
+FRAME_QUEUE_SIZE = 4
+
+# Write buffer between the encode thread and the ffmpeg pipe
+FFMPEG_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Bytes of ffmpeg's error output quoted when it fails
+FFMPEG_ERROR_TAIL = 2000
+
+# H.264 encoders in order of preference with their low-latency options;
+# hardware encoders first, libx264 as the software fallback
+FFMPEG_ENCODERS = (
+    ("h264_nvenc", ["-preset", "p1", "-tune", "ll", "-pix_fmt", "yuv420p"]),
+    ("h264_qsv", ["-preset", "veryfast", "-pix_fmt", "nv12"]),
+    ("h264_amf", ["-usage", "lowlatency", "-pix_fmt", "yuv420p"]),
+    ("h264_videotoolbox", ["-realtime", "1", "-pix_fmt", "yuv420p"]),
+    ("libx264", ["-preset", "ultrafast", "-pix_fmt", "yuv420p"]),
+)
+
+# Optional modules: dxcam and mss capture backends, xxhash for skipping
+# unchanged frames and numba for the fused resize/convert kernel
+@lru_cache(maxsize=None)
+def _optional_import(name: str):
+    """Import an optional module on first use, or return None if missing."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+# Remaining wait below which frame pacing spins instead of sleeping
+SPIN_THRESHOLD = 0.0001
+
+
+class _Timespec(ctypes.Structure):
+    """struct timespec for clock_nanosleep."""
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def _load_clock_nanosleep() -> Optional[Callable]:
+    """Return libc clock_nanosleep if perf_counter shares its clock."""
+    if not sys.platform.startswith("linux"):
+        return None
+    if "CLOCK_MONOTONIC" not in time.get_clock_info("perf_counter").implementation:
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        func = libc.clock_nanosleep
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_int,
+                     ctypes.POINTER(_Timespec), ctypes.POINTER(_Timespec)]
+    func.restype = ctypes.c_int
+    return func
+
+
+_clock_nanosleep = _load_clock_nanosleep()
+CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+EINTR = 4
+
+# Windows high resolution waitable timer (Windows 10 1803+)
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+TIMER_ALL_ACCESS = 0x1F0003
+INFINITE = 0xFFFFFFFF
+WAIT_OBJECT_0 = 0
+
+
+def _create_waitable_timer() -> Optional[int]:
+    """Create a high resolution waitable timer, or None if unsupported."""
+    if sys.platform != "win32":
+        return None
+    try:
+        kernel32 = ctypes.windll.kernel32
+        kernel32.CreateWaitableTimerExW.restype = ctypes.c_void_p
+        handle = kernel32.CreateWaitableTimerExW(
+            None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS
+        )
+    except (OSError, AttributeError):
+        return None
+    return handle or None
+
+
+# Per-monitor DPI awareness for SetProcessDpiAwareness (Windows 8.1+)
+PROCESS_PER_MONITOR_DPI_AWARE = 2
+
+
+def _set_dpi_awareness():
+    """Make the process DPI aware before any window is created.
+    
+    Tk, the region selector and every capture backend must agree on physical
+    pixels. mss switches awareness on when first used, so without this the
+    first selection would be in scaled coordinates and later ones would not.
+    """
+    if sys.platform != "win32":
+        return
+    try:
+        if ctypes.windll.shcore.SetProcessDpiAwareness(PROCESS_PER_MONITOR_DPI_AWARE) == 0:
+            return
+    except (OSError, AttributeError):
+        pass  # shcore is missing before Windows 8.1
+    try:
+        ctypes.windll.user32.SetProcessDPIAware()
+    except (OSError, AttributeError):
+        pass
+
+
+# Fused area-resize + alpha drop, specialized per frame geometry at runtime.
+# Baking the sizes and scale in as constants lets LLVM unroll the block loops.
+_AREA_KERNEL_TEMPLATE = """
+def bgra_to_bgr_area(src, dst):
+    for y in numba.prange({height}):
+        for x in range({width}):
+            b = 0
+            g = 0
+            r = 0
+            for j in range({fy}):
+                row = y * {fy} + j
+                for i in range({fx}):
+                    col = x * {fx} + i
+                    b += src[row, col, 0]
+                    g += src[row, col, 1]
+                    r += src[row, col, 2]
+            dst[y, x, 0] = (b + {half}) // {norm}
+            dst[y, x, 1] = (g + {half}) // {norm}
+            dst[y, x, 2] = (r + {half}) // {norm}
+"""
+
+
+def compile_area_kernel(width: int, height: int, fy: int, fx: int) -> Callable:
+    """Build a Numba kernel that scales a BGRA frame down by (fy, fx) into BGR."""
+    norm = fy * fx
+    source = _AREA_KERNEL_TEMPLATE.format(
+        width=width, height=height, fy=fy, fx=fx, norm=norm, half=norm // 2
+    )
+    numba = _optional_import("numba")
+    namespace = {"numba": numba}
+    exec(source, namespace)
+    # Generated source has no file, so Numba's on-disk cache can't be used;
+    # callers keep compiled kernels in memory instead
+    return numba.njit(parallel=True)(namespace["bgra_to_bgr_area"])
+
+
+def _load_native_converter() -> Optional[Callable]:
+    """Load the optional AVX2 BGRA->BGR library built from bgra2bgr.c."""
+    suffix = ".dll" if sys.platform == "win32" else ".so"
+    path = Path(__file__).with_name("bgra2bgr" + suffix)
+    if not path.exists():
+        return None
+    try:
+        lib = ctypes.CDLL(str(path))
+        func = lib.bgra_to_bgr
+        has_avx2 = lib.bgra_to_bgr_has_avx2()
+    except (OSError, AttributeError) as e:
+        logger.warning(f"Could not load {path.name}: {e}")
+        return None
+    func.argtypes = [ctypes.c_void_p, ctypes.c_ssize_t,
+                     ctypes.c_void_p, ctypes.c_ssize_t,
+                     ctypes.c_int, ctypes.c_int]
+    func.restype = None
+    logger.info(f"Using {path.name} for color conversion (AVX2: {bool(has_avx2)})")
+    return func
+
+
+_native_bgra_to_bgr = _load_native_converter()
+
+
+def bgra_to_bgr(src: np.ndarray, dst: np.ndarray, cvt_color: Callable, code: int):
+    """Drop the alpha channel of src into dst of the same size.
+    
+    cvt_color and code are cv2.cvtColor and cv2.COLOR_BGRA2BGR, bound once by
+    the caller so the OpenCV fallback does not import cv2 on every frame.
+    """
+    # The native kernel takes row strides but needs packed pixels within a row
+    if (_native_bgra_to_bgr is not None
+            and src.strides[1:] == (4, 1) and dst.strides[1:] == (3, 1)):
+        height, width = dst.shape[:2]
+        _native_bgra_to_bgr(src.ctypes.data, src.strides[0],
+                            dst.ctypes.data, dst.strides[0], width, height)
+    else:
+        cvt_color(src, code, dst=dst)
+
 
 class AppState(Enum):
     """Application state enumeration for better state management."""
@@ -69,11 +265,13 @@ class TimerManager:
         self.start_time: Optional[float] = None
         self.is_running = False
         self._after_id: Optional[str] = None
+        self._last_elapsed: Optional[int] = None
     
     def start(self):
         """Start the timer."""
         self.start_time = time.time()
         self.is_running = True
+        self._last_elapsed = None
         self._update_display()
     
     def stop(self):
@@ -91,47 +289,435 @@ class TimerManager:
         if not self.is_running or not self.start_time:
             return
         
-        elapsed = int(time.time() - self.start_time)
-        hours, remainder = divmod(elapsed, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        self.timer_var.set(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
+        elapsed_ms = int((time.time() - self.start_time) * 1000)
+        elapsed = elapsed_ms // 1000
+        
+        # Only reformat when the displayed second actually changes
+        if elapsed != self._last_elapsed:
+            self._last_elapsed = elapsed
+            hours, remainder = divmod(elapsed, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            self.timer_var.set(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
+        
+        # Anchor to the next whole second since start so late ticks don't drift
+        next_ms = 1000 - elapsed_ms % 1000
+        self._after_id = self.update_callback.after(next_ms, self._update_display)
+
+
+class CaptureBackend:
+    """Base class for screen capture backends producing BGRA frames.
+    
+    Backends are opened on the thread that grabs from them.
+    """
+    
+    name = "base"
+    
+    def __init__(self, region: Region):
+        self.region = region
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        """Return True if the backend's dependencies are installed."""
+        return False
+    
+    def open(self) -> 'CaptureBackend':
+        """Acquire capture resources on the calling thread."""
+        return self
+    
+    def grab(self) -> np.ndarray:
+        """Return the latest BGRA frame, valid until the next grab()."""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release capture resources."""
+    
+    def __enter__(self) -> 'CaptureBackend':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DXCamBackend(CaptureBackend):
+    """DXGI Desktop Duplication capture via dxcam (Windows)."""
+    
+    name = "dxcam"
+    _camera = None  # dxcam allows a single camera per output, so share it
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return sys.platform == "win32" and _optional_import("dxcam") is not None
+    
+    def open(self) -> 'DXCamBackend':
+        if DXCamBackend._camera is None:
+            dxcam = _optional_import("dxcam")
+            DXCamBackend._camera = dxcam.create(output_color="BGRA")
+        camera = DXCamBackend._camera
+        
+        # dxcam captures the primary output only
+        right = self.region.x + self.region.width
+        bottom = self.region.y + self.region.height
+        if right > camera.width or bottom > camera.height:
+            raise ValueError("Region is outside the primary display")
+        
+        self._bbox = (self.region.x, self.region.y, right, bottom)
+        self._last: Optional[np.ndarray] = None
+        return self
+    
+    def grab(self) -> np.ndarray:
+        # dxcam returns None when the screen has not changed since the last grab
+        frame = DXCamBackend._camera.grab(region=self._bbox)
+        if frame is not None:
+            self._last = frame
+        elif self._last is None:
+            # The shared camera may have already consumed the current desktop
+            # frame, so seed a static screen from a one-off slow-path grab
+            self._last = PyAutoGUIBackend(self.region).grab()
+        return self._last
+
+
+class MSSBackend(CaptureBackend):
+    """Cross-platform capture via mss."""
+    
+    name = "mss"
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return _optional_import("mss") is not None
+    
+    def open(self) -> 'MSSBackend':
+        import numpy as np
+        self._asarray = np.asarray
+        # mss instances are not thread-safe, so create one per capture thread
+        self._sct = _optional_import("mss").mss()
+        self._monitor = {
+            "left": self.region.x,
+            "top": self.region.y,
+            "width": self.region.width,
+            "height": self.region.height,
+        }
+        return self
+    
+    def grab(self) -> np.ndarray:
+        return self._asarray(self._sct.grab(self._monitor))
+    
+    def close(self):
+        self._sct.close()
+
+
+class PyAutoGUIBackend(CaptureBackend):
+    """Last-resort capture via pyautogui screenshots."""
+    
+    name = "pyautogui"
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return True
+    
+    def grab(self) -> np.ndarray:
+        import cv2
+        import numpy as np
+        import pyautogui
+        screenshot = pyautogui.screenshot(region=self.region.as_tuple)
+        return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGRA)
+
+
+CAPTURE_BACKENDS = (DXCamBackend, MSSBackend, PyAutoGUIBackend)
+
+
+def open_capture_backend(region: Region, backends=CAPTURE_BACKENDS) -> CaptureBackend:
+    """Open the first capture backend that works for this region.
+    
+    Backends receive the region itself so the OS copies only those pixels.
+    """
+    for backend_cls in backends:
+        if not backend_cls.is_available():
+            continue
+        try:
+            backend = backend_cls(region).open()
+        except Exception as e:
+            logger.warning(f"Capture backend {backend_cls.name} unavailable: {e}")
+            continue
+        logger.info(f"Capturing with {backend.name}")
+        return backend
+    raise RuntimeError("No screen capture backend available")
+
+
+# Serializes encoder probing so a recording started during the background
+# warm-up waits for its result instead of probing a second time
+_encoder_probe_lock = threading.Lock()
+
+
+def select_ffmpeg_encoder() -> Tuple[str, Tuple[str, ...]]:
+    """Pick the first H.264 encoder that ffmpeg can actually run here."""
+    with _encoder_probe_lock:
+        return _probe_ffmpeg_encoder()
+
+
+@lru_cache(maxsize=None)
+def _probe_ffmpeg_encoder() -> Tuple[str, Tuple[str, ...]]:
+    """Probe the encoders once; takes seconds when hardware probes time out."""
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    try:
+        listing = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10,
+            creationflags=creationflags
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        listing = ""
+    
+    for name, args in FFMPEG_ENCODERS[:-1]:
+        if f" {name} " not in listing:
+            continue
+        # Hardware encoders are listed even without a matching GPU, so try one frame
+        try:
+            probe = subprocess.run(
+                ["ffmpeg", "-hide_banner", "-loglevel", "error",
+                 "-f", "lavfi", "-i", "color=black:s=256x256",
+                 "-frames:v", "1", "-c:v", name, *args, "-f", "null", "-"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=10, creationflags=creationflags
+            )
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if probe.returncode == 0:
+            return name, tuple(args)
+    
+    name, args = FFMPEG_ENCODERS[-1]
+    return name, tuple(args)
+
+
+class FFmpegWriter:
+    """Pipes raw BGR frames to an ffmpeg subprocess for encoding.
+    
+    Mirrors the parts of the cv2.VideoWriter interface used by VideoRecorder.
+    """
+    
+    def __init__(self, filename: str, fps: int, size: Tuple[int, int],
+                 encoder: Tuple[str, Tuple[str, ...]] = FFMPEG_ENCODERS[-1]):
+        width, height = size
+        codec, codec_args = encoder
+        self.filename = filename
+        self._frames_written = 0
+        command = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "-",
+            "-c:v", codec, *codec_args,
+            # No B-frames and a one second GOP keep frames out of the lookahead
+            "-bf", "0", "-g", str(fps),
+            # Add to the codec flags; replacing them drops global_header, which
+            # leaves the fragmented MP4 without SPS/PPS and undecodable
+            "-flags", "+low_delay",
+            "-max_delay", "0", "-muxdelay", "0", "-muxpreload", "0",
+            # Self-contained one second fragments: if ffmpeg is killed mid-recording,
+            # every completed fragment stays playable and at most ~1 s is lost
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+            "-frag_duration", "1000000",
+            filename,
+        ]
+        # ffmpeg's messages are the only explanation when it fails; a file can't
+        # fill up and stall it the way an unread pipe would
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._proc = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=self._stderr,
+                bufsize=0,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+        except Exception:
+            self._stderr.close()
+            raise
+        # Coalesce per-frame writes into large chunks on the pipe
+        self._stdin = io.BufferedWriter(self._proc.stdin, buffer_size=FFMPEG_BUFFER_SIZE)
+    
+    def isOpened(self) -> bool:
+        """Return True while the ffmpeg process is running."""
+        return self._proc.poll() is None
+    
+    def write(self, frame: np.ndarray):
+        """Queue a frame for encoding without copying it to bytes."""
+        # Flat byte view of the caller's buffer; only non-contiguous frames are copied
+        if not frame.flags.c_contiguous:
+            import numpy as np
+            frame = np.ascontiguousarray(frame)
+        with memoryview(frame).cast('B') as view:
+            try:
+                self._stdin.write(view)
+            except BrokenPipeError:
+                raise IOError(self._failure("ffmpeg stopped accepting frames")) from None
+        self._frames_written += 1
+    
+    def release(self, timeout: float = 10.0):
+        """Flush pending frames and wait for ffmpeg to finalize the file."""
+        try:
+            try:
+                self._stdin.close()
+            except BrokenPipeError:
+                pass  # ffmpeg already exited, reported below
+            try:
+                returncode = self._proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                raise IOError(self._failure("ffmpeg did not finish writing in time", timeout=0))
+            if returncode != 0:
+                raise IOError(self._failure(f"ffmpeg exited with code {returncode}"))
+            if self._frames_written:
+                self._verify_output()
+        finally:
+            self._stderr.close()
+    
+    def _failure(self, message: str, timeout: float = 5.0) -> str:
+        """Append the tail of ffmpeg's error output to message.
         
-        self._after_id = self.update_callback.after(1000, self._update_display)
+        ffmpeg shares the file offset, so it is only read once the process
+        has exited; a process that won't exit is killed first.
+        """
+        try:
+            self._proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._stderr.seek(0, io.SEEK_END)
+        self._stderr.seek(max(0, self._stderr.tell() - FFMPEG_ERROR_TAIL))
+        output = self._stderr.read().decode(errors="replace").strip()
+        return f"{message}: {output}" if output else message
+    
+    def _verify_output(self, timeout: float = 10.0):
+        """Check that the written file decodes, since ffmpeg can exit 0 on a
+        file whose stream parameters are missing."""
+        try:
+            probe = subprocess.run(
+                ["ffmpeg", "-v", "error", "-i", self.filename, "-frames:v", "1",
+                 "-f", "rawvideo", "-pix_fmt", "gray", "-"],
+                capture_output=True, timeout=timeout,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            raise IOError(f"Could not verify {Path(self.filename).name}: {e}")
+        if not probe.stdout:
+            raise IOError(f"{Path(self.filename).name} contains no decodable video")
+
+
+class _RecorderWorker:
+    """Long-lived thread that runs recording jobs posted to it.
+    
+    Reusing the thread across recordings avoids spinning up a new one for
+    every session.
+    """
+    
+    def __init__(self, name: str):
+        self._cv = threading.Condition()
+        self._job: Optional[Callable[[], None]] = None
+        self._job_done: Optional[threading.Event] = None
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def is_busy(self) -> bool:
+        """Return True while a job is queued or running."""
+        with self._cv:
+            return self._job is not None
+    
+    def submit(self, job: Callable[[], None]) -> threading.Event:
+        """Run job on the worker thread; the returned event is set when it ends."""
+        with self._cv:
+            if self._shutdown:
+                raise RuntimeError("Recorder worker has been shut down")
+            if self._job is not None:
+                raise RuntimeError("Recorder worker is busy")
+            self._job = job
+            self._job_done = threading.Event()
+            self._cv.notify()
+            return self._job_done
+    
+    def shutdown(self):
+        """Let the thread exit once the current job, if any, finishes."""
+        with self._cv:
+            self._shutdown = True
+            self._cv.notify()
+    
+    def _run(self):
+        """Wait for jobs and run them one at a time."""
+        while True:
+            with self._cv:
+                self._cv.wait_for(lambda: self._job is not None or self._shutdown)
+                if self._job is None:
+                    return
+                job, done = self._job, self._job_done
+            
+            try:
+                job()
+            except Exception as e:
+                logger.error(f"Recorder worker error: {e}")
+            finally:
+                with self._cv:
+                    self._job = None
+                    self._job_done = None
+                done.set()
 
 
 class VideoRecorder:
     """Handles video recording with proper frame timing."""
     
-    def __init__(self, region: Region, fps: int, filename: str):
+    def __init__(self, region: Region, fps: int, filename: str,
+                 workers: Optional[Tuple[_RecorderWorker, _RecorderWorker]] = None,
+                 kernel_cache: Optional[Dict[Tuple[int, ...], Callable]] = None):
+        import numpy as np
         self.region = region.make_even_dimensions()
         self.fps = fps
         self.filename = filename
-        self.writer: Optional[cv2.VideoWriter] = None
+        self._backends = [cls for cls in CAPTURE_BACKENDS if cls.is_available()]
+        frame_size = (self.region.height, self.region.width)
+        # C-contiguous (the np.empty default) so writers can take a zero-copy view
+        self._bgr_buf = np.empty(frame_size + (3,), dtype=np.uint8, order='C')
+        # Recycled BGRA capture buffers, one per queue slot. The encoder returns
+        # a buffer as soon as it is converted, so while it writes all of them
+        # can be queued again.
+        self._free_bufs: queue.Queue = queue.Queue()
+        for _ in range(FRAME_QUEUE_SIZE):
+            self._free_bufs.put(np.empty(frame_size + (4,), dtype=np.uint8))
+        self._timer_handle = _create_waitable_timer()
+        self.writer = None
         self.stop_event = threading.Event()
-        self._recording_thread: Optional[threading.Thread] = None
+        self._frame_q: Optional[queue.Queue] = None
+        # Capture and encode workers; standalone recorders get their own pair
+        self._owns_workers = workers is None
+        self._capture_worker, self._encode_worker = workers or (
+            _RecorderWorker("capture"), _RecorderWorker("encode")
+        )
+        self._jobs: Tuple[threading.Event, ...] = ()
+        self._job_failed = False
+        # Specialized conversion kernels, shared across recordings when given
+        self._kernel_cache = {} if kernel_cache is None else kernel_cache
         
     def start_recording(self) -> bool:
-        """Start video recording in a separate thread."""
+        """Start video recording with separate capture and encode threads."""
         try:
+            # Check before creating the writer so a rejected start leaves no file
+            if self._capture_worker.is_busy() or self._encode_worker.is_busy():
+                raise RuntimeError("Previous recording is still stopping")
+            
+            self._prepare_resize_kernel()
+            
             # Initialize video writer
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.writer = cv2.VideoWriter(
-                self.filename, 
-                fourcc, 
-                float(self.fps), 
-                (self.region.width, self.region.height)
-            )
+            self.writer = self._create_writer()
             
             if not self.writer.isOpened():
                 raise IOError(f"Cannot initialize video writer for {self.filename}")
             
-            # Start recording thread
+            # Start capture -> encode pipeline
             self.stop_event.clear()
-            self._recording_thread = threading.Thread(
-                target=self._record_loop, 
-                daemon=True
+            self._job_failed = False
+            self._frame_q = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+            self._jobs = (
+                self._encode_worker.submit(self._encode_loop),
+                self._capture_worker.submit(self._capture_loop),
             )
-            self._recording_thread.start()
             logger.info(f"Started recording to {self.filename}")
             return True
             
@@ -140,73 +726,251 @@ class VideoRecorder:
             self._cleanup()
             return False
     
+    def _create_writer(self):
+        """Create an ffmpeg pipe writer, falling back to OpenCV's mp4v encoder."""
+        import cv2
+        size = (self.region.width, self.region.height)
+        if shutil.which("ffmpeg"):
+            encoder = select_ffmpeg_encoder()
+            logger.info(f"Encoding with ffmpeg {encoder[0]}")
+            return FFmpegWriter(self.filename, self.fps, size, encoder)
+        
+        logger.info("ffmpeg not found, encoding with OpenCV mp4v")
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        return cv2.VideoWriter(self.filename, fourcc, float(self.fps), size)
+    
     def stop_recording(self, timeout: float = 5.0) -> bool:
-        """Stop video recording gracefully."""
-        if not self._recording_thread or not self._recording_thread.is_alive():
-            return True
+        """Stop video recording gracefully.
         
-        logger.info("Stopping recording...")
-        self.stop_event.set()
+        Returns False if the threads did not stop, a thread ended on an
+        error, or the video file could not be finalized.
+        """
+        stopped = True
+        if not all(done.is_set() for done in self._jobs):
+            logger.info("Stopping recording...")
+            self.stop_event.set()
+            
+            try:
+                # Capture stops first and hands the sentinel to the encoder,
+                # which drains queued frames before exiting
+                deadline = time.perf_counter() + timeout
+                for done in self._jobs:
+                    done.wait(timeout=max(0, deadline - time.perf_counter()))
+                stopped = all(done.is_set() for done in self._jobs)
+                if stopped:
+                    logger.info("Recording stopped successfully")
+                else:
+                    logger.warning("Recording threads did not stop within timeout")
+            except Exception as e:
+                logger.error(f"Error stopping recording: {e}")
+                stopped = False
+        
+        # Always finalize the writer, even if the jobs already ended on their own
+        released = self._cleanup()
+        if self._job_failed:
+            logger.warning("Recording ended early because of an error")
+        return stopped and released and not self._job_failed
+    
+    def _capture_loop(self):
+        """Capture frames at a fixed rate and hand them to the encoder."""
+        import numpy as np
+        frame_interval = 1.0 / self.fps
+        # Bind hot-path callables once to keep per-frame bytecode minimal
+        pc = time.perf_counter
+        copyto = np.copyto
+        stopped = self.stop_event.is_set
+        take_buf = self._free_bufs.get_nowait
+        return_buf = self._free_bufs.put_nowait
+        post_frame = self._frame_q.put_nowait
+        sleep_until = self._sleep_until
+        buf_shape = (self.region.height, self.region.width, 4)
+        next_frame_time = pc()
+        dropped = 0
         
         try:
-            self._recording_thread.join(timeout=timeout)
-            success = not self._recording_thread.is_alive()
-            if success:
-                logger.info("Recording stopped successfully")
-            else:
-                logger.warning("Recording thread did not stop within timeout")
-            return success
+            with open_capture_backend(self.region, self._backends) as backend:
+                grab = backend.grab
+                while not stopped():
+                    # Capture frame (BGRA straight from the native screen API)
+                    raw = grab()
+                    
+                    # Never block on the encoder; drop the frame to stay real-time
+                    try:
+                        buf = take_buf()
+                    except queue.Empty:
+                        dropped += 1
+                    else:
+                        if raw.shape == buf_shape:
+                            copyto(buf, raw)
+                            try:
+                                post_frame(buf)
+                            except queue.Full:
+                                # Slots taken by unpooled (resized) frames
+                                return_buf(buf)
+                                dropped += 1
+                        else:
+                            # Unexpected size (e.g. HiDPI), let the encoder resize it
+                            return_buf(buf)
+                            try:
+                                post_frame(raw)
+                            except queue.Full:
+                                dropped += 1
+                    
+                    # Calculate precise timing for next frame
+                    next_frame_time += frame_interval
+                    if next_frame_time > pc():
+                        # Use precise sleep for better timing
+                        sleep_until(next_frame_time)
+                    else:
+                        # If we're behind, adjust next frame time
+                        next_frame_time = pc()
+                    
         except Exception as e:
-            logger.error(f"Error stopping recording: {e}")
-            return False
+            logger.error(f"Capture error: {e!r}")
+            self._job_failed = True
         finally:
-            self._cleanup()
+            # Sentinel tells the encoder no more frames are coming
+            self._frame_q.put(None)
+            if dropped:
+                logger.warning(f"Dropped {dropped} frames while encoder was busy")
     
-    def _record_loop(self):
-        """Main recording loop with precise frame timing."""
-        frame_interval = 1.0 / self.fps
-        next_frame_time = time.perf_counter()
+    def _encode_loop(self):
+        """Convert queued frames to BGR and write them to the video file."""
+        import cv2
+        # Bind hot-path callables once to keep per-frame bytecode minimal
+        cvt_color, resize = cv2.cvtColor, cv2.resize
+        bgra2bgr, inter_area = cv2.COLOR_BGRA2BGR, cv2.INTER_AREA
+        resize_frame = self._resize_frame
+        next_frame = self._frame_q.get
+        return_buf = self._free_bufs.put_nowait
+        write = self.writer.write
+        xxhash = _optional_import("xxhash")
+        frame_hasher = xxhash.xxh3_64_intdigest if xxhash else None
+        bgr_buf = self._bgr_buf
+        frame_size = bgr_buf.shape[:2]
         frame_count = 0
+        # Hash of the frame currently held in the BGR buffer
+        last_hash = None
         
         try:
-            while not self.stop_event.is_set():
-                current_time = time.perf_counter()
+            while True:
+                frame = next_frame()
+                if frame is None:
+                    break
                 
-                # Capture frame
-                screenshot = pyautogui.screenshot(region=self.region.as_tuple)
-                frame = np.array(screenshot)
-                
-                # Convert RGB to BGR for OpenCV
-                frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-                
-                # Resize if necessary (shouldn't be needed with proper region)
-                if frame_bgr.shape[:2] != (self.region.height, self.region.width):
-                    frame_bgr = cv2.resize(
-                        frame_bgr, 
-                        (self.region.width, self.region.height),
-                        interpolation=cv2.INTER_AREA
-                    )
+                if frame.shape[:2] == frame_size:
+                    # Static content: the BGR buffer already holds this frame
+                    frame_hash = frame_hasher(frame) if frame_hasher else None
+                    if frame_hash is None or frame_hash != last_hash:
+                        # Drop alpha channel straight into the reusable frame buffer
+                        bgra_to_bgr(frame, bgr_buf, cvt_color, bgra2bgr)
+                        last_hash = frame_hash
+                    # Frames of the region size always come from the buffer pool
+                    return_buf(frame)
+                else:
+                    # Resize if necessary (e.g. HiDPI scaling returns more pixels)
+                    resize_frame(frame, cvt_color, resize, bgra2bgr, inter_area)
+                    last_hash = None
                 
                 # Write frame
-                self.writer.write(frame_bgr)
+                write(bgr_buf)
                 frame_count += 1
                 
-                # Calculate precise timing for next frame
-                next_frame_time += frame_interval
-                sleep_duration = next_frame_time - time.perf_counter()
-                
-                if sleep_duration > 0:
-                    # Use precise sleep for better timing
-                    self._precise_sleep(sleep_duration)
-                else:
-                    # If we're behind, adjust next frame time
-                    next_frame_time = time.perf_counter()
-                    
         except Exception as e:
-            logger.error(f"Recording error: {e}")
+            logger.error(f"Recording error: {e!r}")
+            self._job_failed = True
+            # Keep consuming so capture never blocks on a dead encoder
+            self.stop_event.set()
+            while self._frame_q.get() is not None:
+                pass
         finally:
             logger.info(f"Recording completed. Frames recorded: {frame_count}")
     
+    def _area_kernel_key(self, frame_shape: Tuple[int, ...]) -> Optional[Tuple[int, ...]]:
+        """Return the kernel cache key for an integer-scaled frame, else None."""
+        height, width = self._bgr_buf.shape[:2]
+        fy, ry = divmod(frame_shape[0], height)
+        fx, rx = divmod(frame_shape[1], width)
+        if fy and fx and not (ry or rx) and (fy, fx) != (1, 1):
+            return (width, height, fy, fx)
+        return None
+    
+    def _prepare_resize_kernel(self):
+        """Compile the HiDPI resize kernel before recording starts.
+        
+        JIT compilation takes the better part of a second, which would stall
+        the encoder and drop frames if it happened on the first frame.
+        """
+        if _optional_import("numba") is None:
+            return
+        try:
+            # The frame size can only be known from an actual grab
+            with open_capture_backend(self.region, self._backends) as backend:
+                frame = backend.grab()
+            key = self._area_kernel_key(frame.shape)
+            if key is None or key in self._kernel_cache:
+                return
+            kernel = compile_area_kernel(*key)
+            kernel(frame, self._bgr_buf)  # First call compiles for these array types
+            self._kernel_cache[key] = kernel
+        except Exception as e:
+            logger.warning(f"Could not prepare resize kernel: {e}")
+    
+    def _resize_frame(self, frame: np.ndarray, cvt_color: Callable, resize: Callable,
+                      code: int, interpolation: int):
+        """Scale a BGRA frame of unexpected size into the BGR buffer.
+        
+        The OpenCV fallback uses the cv2 functions and constants bound by the
+        encode loop.
+        """
+        height, width = self._bgr_buf.shape[:2]
+        # Only use kernels compiled up front; never JIT on the encode thread
+        kernel = self._kernel_cache.get(self._area_kernel_key(frame.shape))
+        
+        if kernel is not None:
+            # Integer scale (typical HiDPI): fuse resize and alpha drop in one pass
+            kernel(frame, self._bgr_buf)
+        else:
+            resize(
+                cvt_color(frame, code),
+                (width, height),
+                dst=self._bgr_buf,
+                interpolation=interpolation
+            )
+    
+    def _sleep_until(self, deadline: float):
+        """Sleep until a perf_counter deadline using OS high resolution timers."""
+        remaining = deadline - time.perf_counter()
+        if remaining <= SPIN_THRESHOLD:
+            while time.perf_counter() < deadline:
+                pass
+            return
+        
+        if _clock_nanosleep:
+            # perf_counter is CLOCK_MONOTONIC here, so sleep to the absolute deadline
+            sec, frac = divmod(deadline, 1.0)
+            ts = _Timespec(int(sec), int(frac * 1e9))
+            while _clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME,
+                                   ctypes.byref(ts), None) == EINTR:
+                pass
+        elif self._timer_handle:
+            kernel32 = ctypes.windll.kernel32
+            # Negative due time is relative, in 100 ns units
+            due = ctypes.c_longlong(-int(remaining * 1e7))
+            if not (kernel32.SetWaitableTimer(ctypes.c_void_p(self._timer_handle),
+                                              ctypes.byref(due), 0, None, None, False)
+                    and kernel32.WaitForSingleObject(ctypes.c_void_p(self._timer_handle),
+                                                     INFINITE) == WAIT_OBJECT_0):
+                self._precise_sleep(deadline - time.perf_counter())
+                return
+        else:
+            self._precise_sleep(remaining)
+            return
+        
+        # Spin off any sub-threshold residual left by the timer
+        while time.perf_counter() < deadline:
+            pass
+    
     @staticmethod
     def _precise_sleep(duration: float):
         """More precise sleep for better frame timing."""
@@ -226,20 +990,48 @@ class VideoRecorder:
             while time.perf_counter() < end_time:
                 pass
     
-    def _cleanup(self):
-        """Clean up resources."""
+    def _cleanup(self) -> bool:
+        """Clean up resources; returns False if the writer failed to finalize."""
+        released = True
         if self.writer:
             try:
                 self.writer.release()
                 logger.info("Video writer released")
             except Exception as e:
                 logger.error(f"Error releasing video writer: {e}")
+                released = False
             finally:
                 self.writer = None
+        
+        if self._timer_handle:
+            ctypes.windll.kernel32.CloseHandle(ctypes.c_void_p(self._timer_handle))
+            self._timer_handle = None
+        
+        if self._owns_workers:
+            self._capture_worker.shutdown()
+            self._encode_worker.shutdown()
+        return released
+
+
+# Selection marquee appearance
+MARQUEE_COLOR = 'red'
+MARQUEE_WIDTH = 2
+
+# Windows extended window styles for click-through marquee strips
+GWL_EXSTYLE = -20
+WS_EX_LAYERED = 0x00080000
+WS_EX_TRANSPARENT = 0x00000020
+GA_ROOT = 2
+LWA_ALPHA = 0x00000002
 
 
 class RegionSelector:
-    """Handles region selection with a crosshair overlay."""
+    """Handles region selection with a crosshair overlay.
+    
+    The full-screen input window is effectively invisible and never redrawn;
+    the selection is shown by four thin marquee windows instead, so the
+    compositor is not blending a shaded full-screen surface while dragging.
+    """
     
     def __init__(self, parent, callback: Callable[[Optional[Region]], None]):
         self.parent = parent
@@ -247,7 +1039,12 @@ class RegionSelector:
         self.window: Optional[tk.Toplevel] = None
         self.canvas: Optional[tk.Canvas] = None
         self.start_pos: Optional[Tuple[int, int]] = None
-        self.rect_id: Optional[int] = None
+        self.marquee: List[tk.Toplevel] = []
+        self._marquee_rect: Optional[Tuple[int, int, int, int]] = None
+        self._marquee_shown = False
+        self._click_through = False
+        self._drag_pos: Optional[Tuple[float, float]] = None
+        self._drag_after_id: Optional[str] = None
     
     def start_selection(self):
         """Start the region selection process."""
@@ -269,12 +1066,13 @@ class RegionSelector:
         screen_height = self.window.winfo_screenheight()
         self.window.geometry(f"{screen_width}x{screen_height}+0+0")
         
-        # Semi-transparent overlay
-        self.window.attributes('-alpha', 0.3)
+        # Practically invisible but still receives mouse input; nothing is
+        # drawn on it, so it never needs repainting during the drag
+        self.window.attributes('-alpha', 0.01)
         self.window.attributes('-topmost', True)
         self.window.configure(cursor="crosshair", bg='black')
         
-        # Canvas for drawing selection rectangle
+        # Canvas receiving the mouse events
         self.canvas = tk.Canvas(
             self.window, 
             highlightthickness=0,
@@ -290,30 +1088,119 @@ class RegionSelector:
         self.window.bind("<Escape>", self._on_cancel)
         self.window.bind("<KeyPress>", self._on_key)
     
+    def _create_marquee(self):
+        """Create the four border strips outlining the selection."""
+        for _ in range(4):
+            strip = tk.Toplevel(self.window)
+            strip.overrideredirect(True)
+            strip.attributes('-topmost', True)
+            strip.configure(bg=MARQUEE_COLOR)
+            # Keep unmapped until positioned, or it flashes at its default geometry
+            strip.withdraw()
+            self.marquee.append(strip)
+        self._click_through = False
+    
+    @staticmethod
+    def _make_click_through(window: tk.Toplevel):
+        """Let mouse input pass through a window (Windows only)."""
+        if sys.platform != "win32":
+            return
+        try:
+            window.update_idletasks()
+            user32 = ctypes.windll.user32
+            user32.GetAncestor.restype = ctypes.c_void_p
+            hwnd = ctypes.c_void_p(user32.GetAncestor(window.winfo_id(), GA_ROOT))
+            style = user32.GetWindowLongW(hwnd, GWL_EXSTYLE)
+            user32.SetWindowLongW(hwnd, GWL_EXSTYLE,
+                                  style | WS_EX_LAYERED | WS_EX_TRANSPARENT)
+            # A layered window is not drawn until its attributes are set
+            user32.SetLayeredWindowAttributes(hwnd, 0, 255, LWA_ALPHA)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Could not make marquee click-through: {e}")
+    
+    def _move_marquee(self, x1: float, y1: float, x2: float, y2: float):
+        """Position the border strips around the given rectangle."""
+        left, top = int(min(x1, x2)), int(min(y1, y2))
+        width = max(int(abs(x2 - x1)), MARQUEE_WIDTH)
+        height = max(int(abs(y2 - y1)), MARQUEE_WIDTH)
+        edge = MARQUEE_WIDTH
+        
+        # Sub-pixel mouse moves don't change anything on screen
+        rect = (left, top, width, height)
+        if rect == self._marquee_rect:
+            return
+        self._marquee_rect = rect
+        
+        top_strip, bottom_strip, left_strip, right_strip = self.marquee
+        top_strip.geometry(f"{width}x{edge}+{left}+{top}")
+        bottom_strip.geometry(f"{width}x{edge}+{left}+{top + height - edge}")
+        left_strip.geometry(f"{edge}x{height}+{left}+{top}")
+        right_strip.geometry(f"{edge}x{height}+{left + width - edge}+{top}")
+    
+    def _hide_marquee(self):
+        """Hide the border strips, keeping them for the next drag."""
+        for strip in self.marquee:
+            strip.withdraw()
+        self._marquee_rect = None
+        self._marquee_shown = False
+    
+    def _destroy_marquee(self):
+        """Remove the border strips."""
+        self._cancel_pending_drag()
+        for strip in self.marquee:
+            try:
+                strip.destroy()
+            except tk.TclError:
+                pass  # Already destroyed with the overlay
+        self.marquee = []
+        self._marquee_rect = None
+    
+    def _cancel_pending_drag(self):
+        """Drop a scheduled marquee update."""
+        if self._drag_after_id and self.window:
+            try:
+                self.window.after_cancel(self._drag_after_id)
+            except tk.TclError:
+                pass  # Window might be destroyed
+        self._drag_after_id = None
+        self._drag_pos = None
+    
     def _on_press(self, event):
         """Handle mouse press."""
         self.start_pos = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
-        if self.rect_id:
-            self.canvas.delete(self.rect_id)
-            self.rect_id = None
+        self._cancel_pending_drag()
+        self._hide_marquee()
     
     def _on_drag(self, event):
         """Handle mouse drag."""
         if not self.start_pos:
             return
         
-        current_pos = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        # Coalesce bursts of motion events (e.g. 1000 Hz mice) into one
+        # marquee update per idle cycle, using the latest position
+        self._drag_pos = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if not self._drag_after_id:
+            self._drag_after_id = self.window.after_idle(self._update_marquee)
+    
+    def _update_marquee(self):
+        """Move the marquee to the latest drag position."""
+        self._drag_after_id = None
+        if not self.start_pos or not self._drag_pos:
+            return
         
-        # Clear previous rectangle
-        if self.rect_id:
-            self.canvas.delete(self.rect_id)
+        if not self.marquee:
+            self._create_marquee()
+        self._move_marquee(*self.start_pos, *self._drag_pos)
+        if not self._marquee_shown:
+            for strip in self.marquee:
+                strip.deiconify()
+            self._marquee_shown = True
         
-        # Draw new rectangle
-        self.rect_id = self.canvas.create_rectangle(
-            self.start_pos[0], self.start_pos[1],
-            current_pos[0], current_pos[1],
-            outline='red', width=2, dash=(5, 5)
-        )
+        # Styles need the mapped native window, so apply them once it exists
+        if not self._click_through:
+            for strip in self.marquee:
+                self._make_click_through(strip)
+            self._click_through = True
     
     def _on_release(self, event):
         """Handle mouse release."""
@@ -356,6 +1243,7 @@ class RegionSelector:
     
     def _cleanup(self, region: Optional[Region]):
         """Clean up and execute callback."""
+        self._destroy_marquee()
         if self.window:
             try:
                 self.window.destroy()
@@ -376,11 +1264,22 @@ class ScreenCaptureApp:
     """Main application class with improved architecture."""
     
     def __init__(self):
+        # Must precede tk.Tk() so selections and captures use the same pixels
+        _set_dpi_awareness()
         self.root = tk.Tk()
         self.state = AppState.IDLE
         self.recorder: Optional[VideoRecorder] = None
         self.timer_manager: Optional[TimerManager] = None
         self.output_directory = Path.cwd()
+        # Recording threads are kept alive and reused across recordings
+        self._recorder_workers = (_RecorderWorker("capture"), _RecorderWorker("encode"))
+        # Probe encoders now, off the Tk thread, so the first recording starts at once
+        if shutil.which("ffmpeg"):
+            threading.Thread(
+                target=select_ffmpeg_encoder, name="encoder-probe", daemon=True
+            ).start()
+        # Compiled frame kernels keyed by geometry, reused by later recordings
+        self._kernel_cache: Dict[Tuple[int, ...], Callable] = {}
         
         self._setup_ui()
         self._setup_logging()
@@ -613,13 +1512,20 @@ class ScreenCaptureApp:
                 return
             
             try:
+                import cv2
                 filename = self._generate_filename("screenshot", "png")
                 
                 # Small delay to ensure UI is hidden
                 time.sleep(0.1)
                 
-                screenshot = pyautogui.screenshot(region=region.as_tuple)
-                screenshot.save(filename)
+                with open_capture_backend(region) as backend:
+                    frame = cv2.cvtColor(backend.grab(), cv2.COLOR_BGRA2BGR)
+                
+                # imencode + write_bytes handles non-ASCII paths, unlike imwrite
+                ok, png = cv2.imencode(".png", frame)
+                if not ok:
+                    raise IOError("Could not encode screenshot")
+                Path(filename).write_bytes(png.tobytes())
                 
                 self._set_status(f"Screenshot saved: {Path(filename).name}", 5000)
                 messagebox.showinfo(
@@ -663,7 +1569,9 @@ class ScreenCaptureApp:
                 filename = self._generate_filename("recording", "mp4")
                 fps = int(self.fps_var.get())
                 
-                self.recorder = VideoRecorder(region, fps, filename)
+                self.recorder = VideoRecorder(
+                    region, fps, filename, self._recorder_workers, self._kernel_cache
+                )
                 
                 if self.recorder.start_recording():
                     self.state = AppState.RECORDING
@@ -702,8 +1610,10 @@ class ScreenCaptureApp:
                 )
                 logger.info(f"Recording completed: {self.recorder.filename}")
             else:
-                self._set_status("Recording stop timeout", 5000)
-                logger.warning("Recording stop timed out")
+                error_msg = "Recording did not finish cleanly, see the log for details"
+                self._set_status(error_msg, 5000)
+                messagebox.showerror("Error", error_msg, parent=self.root)
+                logger.warning(f"Recording may be incomplete: {self.recorder.filename}")
                 
         except Exception as e:
             error_msg = f"Error stopping recording: {str(e)}"
@@ -739,6 +1649,8 @@ class ScreenCaptureApp:
         finally:
             if self.recorder:
                 self.recorder.stop_recording()
+            for worker in self._recorder_workers:
+                worker.shutdown()
             logger.info("Application shutdown")
 
 
@@ -0,0 +1,88 @@
+/*
+ * BGRA -> BGR channel drop for the screen recorder's encode thread.
+ *
+ * Optional: app.py loads this through ctypes when the shared library sits
+ * next to it, and falls back to OpenCV otherwise. Build with GCC or Clang
+ * (MinGW on Windows):
+ *
+ *   gcc -O3 -shared -fPIC -fopenmp -o bgra2bgr.so bgra2bgr.c
+ *   gcc -O3 -shared -fopenmp -o bgra2bgr.dll bgra2bgr.c
+ *
+ * The AVX2 path is compiled with a per-function target attribute instead of
+ * a global -mavx2, so the library still loads and runs on CPUs without AVX2.
+ */
+#include <stddef.h>
+#include <stdint.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+#define HAVE_X86 1
+#endif
+
+#ifdef _WIN32
+#define EXPORT __declspec(dllexport)
+#else
+#define EXPORT __attribute__((visibility("default")))
+#endif
+
+static void row_scalar(const uint8_t *src, uint8_t *dst, int x, int width)
+{
+    for (; x < width; x++) {
+        dst[3 * x + 0] = src[4 * x + 0];
+        dst[3 * x + 1] = src[4 * x + 1];
+        dst[3 * x + 2] = src[4 * x + 2];
+    }
+}
+
+#ifdef HAVE_X86
+__attribute__((target("avx2")))
+static void row_avx2(const uint8_t *src, uint8_t *dst, int width)
+{
+    /* Pack each lane's 4 pixels into its low 12 bytes, then join the lanes */
+    const __m256i shuffle = _mm256_setr_epi8(
+        0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, -1, -1, -1, -1,
+        0, 1, 2, 4, 5, 6, 8, 9, 10, 12, 13, 14, -1, -1, -1, -1);
+    const __m256i permute = _mm256_setr_epi32(0, 1, 2, 4, 5, 6, 3, 7);
+    int x = 0;
+
+    /* Each store writes 32 bytes of which 24 are pixels; stop while the
+     * 8 spare bytes still land inside this row so rows never overlap. */
+    for (; x + 11 <= width; x += 8) {
+        __m256i v = _mm256_loadu_si256((const __m256i *)(src + 4 * x));
+        v = _mm256_shuffle_epi8(v, shuffle);
+        v = _mm256_permutevar8x32_epi32(v, permute);
+        _mm256_storeu_si256((__m256i *)(dst + 3 * x), v);
+    }
+    row_scalar(src, dst, x, width);
+}
+#endif
+
+EXPORT int bgra_to_bgr_has_avx2(void)
+{
+#ifdef HAVE_X86
+    return __builtin_cpu_supports("avx2") ? 1 : 0;
+#else
+    return 0;
+#endif
+}
+
+EXPORT void bgra_to_bgr(const uint8_t *src, ptrdiff_t src_stride,
+                        uint8_t *dst, ptrdiff_t dst_stride,
+                        int width, int height)
+{
+    int avx2 = bgra_to_bgr_has_avx2();
+    int y;
+
+#pragma omp parallel for schedule(static)
+    for (y = 0; y < height; y++) {
+        const uint8_t *s = src + (ptrdiff_t)y * src_stride;
+        uint8_t *d = dst + (ptrdiff_t)y * dst_stride;
+#ifdef HAVE_X86
+        if (avx2) {
+            row_avx2(s, d, width);
+            continue;
+        }
+#endif
+        row_scalar(s, d, 0, width);
+    }
+}